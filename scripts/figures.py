@@ -0,0 +1,31 @@
+"""
+Shared figure handling for the K6 plotting scripts.
+"""
+
+import matplotlib.pyplot as plt
+
+def prepare_axes(ax, figsize):
+    """Return (fig, ax): ax cleared for reuse, or a new figure of figsize when ax is None."""
+    if ax is None:
+        return plt.subplots(figsize=figsize)
+    ax.cla()
+    return ax.figure, ax
+
+def render_files(paths, plot_fn, figsize, interactive=False):
+    """Call plot_fn(path, ax) for each path, reusing a single Figure/Axes for all of them.
+    
+    Interactive runs pass ax=None so each file gets a figure of its own:
+    closing the window drops a figure from pyplot, so a shared one could only
+    be shown once.
+    """
+    if interactive:
+        for path in paths:
+            plot_fn(path, None)
+        return
+    
+    fig, ax = plt.subplots(figsize=figsize)
+    try:
+        for path in paths:
+            plot_fn(path, ax)
+    finally:
+        plt.close(fig)
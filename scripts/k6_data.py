@@ -0,0 +1,60 @@
+"""
+Shared helpers for loading K6 benchmark results and summarising them.
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+def metric_mask(names, metric):
+    """Boolean mask of the rows in a dictionary-encoded metric_name block equal to metric.
+    
+    Looks up the metric's code in the block's dictionary once and compares the
+    raw integer indices, rather than comparing strings row by row.
+    """
+    code = names.dictionary.index(metric).as_py()
+    return names.indices.to_numpy(zero_copy_only=False) == code
+
+def load_metric(path, metric, columns):
+    """Load the given numeric columns of every row of metric from a K6 CSV file.
+    
+    Returns one float64 array per column, in the order given; the arrays are
+    empty when the file has no rows for metric.
+    """
+    # Stream the file block by block (pyarrow handles both .gz and regular
+    # files) through a 1 MiB buffer, so gzip is inflated in large chunks rather
+    # than many small reads. Only the columns we use are kept (metric_name
+    # dictionary-encoded, since only a handful of names repeat on every row),
+    # and only the rows of the metric.
+    source = pa.input_stream(path, compression='detect', buffer_size=1 << 20)
+    column_types = {'metric_name': pa.dictionary(pa.int32(), pa.string())}
+    column_types.update((column, pa.float64()) for column in columns)
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=1 << 20),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=['metric_name', *columns],
+            column_types=column_types,
+        ),
+    )
+    blocks = [[] for _ in columns]
+    for batch in reader:
+        mask = metric_mask(batch.column('metric_name'), metric)
+        for column, column_blocks in zip(columns, blocks):
+            column_blocks.append(batch.column(column).to_numpy(zero_copy_only=False)[mask])
+    return tuple(np.concatenate(column_blocks or [np.empty(0)]) for column_blocks in blocks)
+
+def percentile_from_sorted(sorted_values, q):
+    """Linearly interpolated quantile (pandas/numpy default) of an already-sorted array."""
+    pos = q * (len(sorted_values) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def requests_per_second(timestamps):
+    """Request count of every second (of float Unix timestamps) that saw at least one request."""
+    # Floor to whole seconds and count with a single histogram pass over the
+    # second offsets, then drop the seconds without requests
+    seconds = np.floor(timestamps).astype(np.int64)
+    counts = np.bincount(seconds - seconds.min())
+    return counts[counts > 0]
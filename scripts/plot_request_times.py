@@ -4,14 +4,44 @@ Simple time series plot of HTTP request times with P95/P99 reference lines.
 """
 
 import argparse
-import gzip
-import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
 import re
+from k6_data import load_metric, percentile_from_sorted
+from figures import prepare_axes, render_files
 
-def plot_request_times(file_path):
+# Figure size shared by every file plotted in one run
+FIGSIZE = (12, 6)
+
+def downsample_minmax(x, y, n_out=2000):
+    """Reduce a series to at most n_out points while keeping its visual envelope.
+    
+    Splits the samples into n_out // 2 equal-count buckets and keeps the
+    minimum and maximum sample of each (in their original order), so spikes
+    still show up but the line has far fewer segments to draw.
+    """
+    if len(y) <= n_out:
+        return x, y
+    
+    n_buckets = n_out // 2
+    starts = (np.arange(n_buckets) * len(y)) // n_buckets
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, len(y))))
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    
+    # Index of the first sample hitting each bucket's min and max
+    lo_idx = np.flatnonzero(y == lo[bucket])
+    lo_idx = lo_idx[np.unique(bucket[lo_idx], return_index=True)[1]]
+    hi_idx = np.flatnonzero(y == hi[bucket])
+    hi_idx = hi_idx[np.unique(bucket[hi_idx], return_index=True)[1]]
+    
+    keep = np.union1d(lo_idx, hi_idx)
+    return x[keep], y[keep]
+
+def plot_request_times(file_path, interactive=False, ax=None):
     """Plot time series of HTTP request duration with percentile lines for a single file."""
     
     # Extract config name from filename
@@ -25,91 +55,107 @@ def plot_request_times(file_path):
     
     print(f"Loading {config} from {file_path}...")
     
-    # Load data
-    with gzip.open(file_path, 'rt') as f:
-        df = pd.read_csv(f)
-    
-    # Filter for HTTP request duration only
-    http_duration = df[df['metric_name'] == 'http_req_duration'].copy()
+    timestamps, values = load_metric(file_path, 'http_req_duration', ['timestamp', 'metric_value'])
     
-    if http_duration.empty:
+    if len(timestamps) == 0:
         print("No HTTP request duration data found!")
         return
     
-    # Convert timestamp to datetime
-    http_duration['timestamp'] = pd.to_datetime(http_duration['timestamp'], unit='s')
-    
-    # Sort by timestamp
-    http_duration = http_duration.sort_values('timestamp')
+    # Sort by timestamp (kept as float Unix seconds, no datetime conversion needed).
+    # K6 writes samples in roughly append order, so skip the sort when they
+    # are already ordered
+    if not np.all(timestamps[1:] >= timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        values = values[order]
     
     # Calculate start time for relative timing
-    start_time = http_duration['timestamp'].min()
-    http_duration['relative_time'] = (http_duration['timestamp'] - start_time).dt.total_seconds()
+    start_time = timestamps[0]
+    relative_time = timestamps - start_time
+    
+    # Calculate percentiles, average and max from a single sort of the durations
+    sorted_values = np.sort(values)
+    p95 = percentile_from_sorted(sorted_values, 0.95)
+    p99 = percentile_from_sorted(sorted_values, 0.99)
+    avg = values.mean()
+    max_val = sorted_values[-1]
+    
+    owns_figure = ax is None
+    fig, ax = prepare_axes(ax, FIGSIZE)
     
-    # Calculate percentiles
-    p95 = http_duration['metric_value'].quantile(0.95)
-    p99 = http_duration['metric_value'].quantile(0.99)
+    _render(ax, relative_time, values, p95, p99, config)
+    fig.tight_layout()
     
-    # Create plot
-    plt.figure(figsize=(12, 6))
+    # Save with config name
+    output_file = f'request_times_{config}.png'
+    fig.savefig(output_file, dpi=300, bbox_inches='tight')
+    if interactive:
+        plt.show()
+    if owns_figure:
+        plt.close(fig)
     
-    # Plot time series
-    plt.plot(http_duration['relative_time'], 
-             http_duration['metric_value'], 
-             color='blue', 
-             alpha=0.6,
-             linewidth=0.8,
-             label='Request Duration')
+    print(f"📊 Statistics:")
+    print(f"  P95: {p95:.1f}ms")
+    print(f"  P99: {p99:.1f}ms")
+    print(f"  Average: {avg:.1f}ms")
+    print(f"  Max: {max_val:.1f}ms")
+    print(f"📈 Plot saved as: {output_file}")
+
+def _render(ax, relative_time, values, p95, p99, config):
+    """Draw the duration time series and percentile lines onto ax."""
+    
+    # Plot time series, downsampled for drawing (stats use every sample)
+    plot_time, plot_values = downsample_minmax(relative_time, values)
+    ax.plot(plot_time, 
+            plot_values, 
+            color='blue', 
+            alpha=0.6,
+            linewidth=0.8,
+            label='Request Duration')
     
     # Plot P95 line
-    plt.axhline(y=p95, 
+    ax.axhline(y=p95, 
                color='orange', 
                linestyle='--', 
                linewidth=2,
                label=f'P95: {p95:.1f}ms')
     
     # Plot P99 line  
-    plt.axhline(y=p99, 
+    ax.axhline(y=p99, 
                color='red', 
                linestyle=':', 
                linewidth=2,
                label=f'P99: {p99:.1f}ms')
     
-    plt.xlabel('Time (seconds)')
-    plt.ylabel('HTTP Request Duration (ms)')
-    plt.title(f'HTTP Request Duration Time Series - {config}')
-    plt.grid(True, alpha=0.3)
-    plt.legend()
-    
-    plt.tight_layout()
-    
-    # Save with config name
-    output_file = f'request_times_{config}.png'
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.show()
-    
-    print(f"📊 Statistics:")
-    print(f"  P95: {p95:.1f}ms")
-    print(f"  P99: {p99:.1f}ms")
-    print(f"  Average: {http_duration['metric_value'].mean():.1f}ms")
-    print(f"  Max: {http_duration['metric_value'].max():.1f}ms")
-    print(f"📈 Plot saved as: {output_file}")
+    ax.set_xlabel('Time (seconds)')
+    ax.set_ylabel('HTTP Request Duration (ms)')
+    ax.set_title(f'HTTP Request Duration Time Series - {config}')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
 
 def main():
     parser = argparse.ArgumentParser(description='Plot HTTP request duration time series from K6 benchmark data')
-    parser.add_argument('file', help='Path to gzipped CSV file (e.g., quickpizza-custom-grpc-20vus-60s-t3.medium.gz)')
+    parser.add_argument('files', nargs='+', help='Path(s) to gzipped CSV files (e.g., quickpizza-custom-grpc-20vus-60s-t3.medium.gz)')
+    parser.add_argument('--interactive', '-i', 
+                       action='store_true',
+                       help='Show the plot in an interactive window after saving it')
     
     args = parser.parse_args()
     
-    if not Path(args.file).exists():
-        print(f"❌ File not found: {args.file}")
-        return
+    for file in args.files:
+        if not Path(file).exists():
+            print(f"❌ File not found: {file}")
+            return
+    
+    if args.interactive:
+        plt.switch_backend(matplotlib.rcParamsOrig['backend'])
     
     try:
-        plot_request_times(args.file)
+        render_files(args.files, lambda path, ax: plot_request_times(path, args.interactive, ax=ax),
+                     FIGSIZE, args.interactive)
     except ImportError as e:
         print(f"❌ Missing libraries: {e}")
-        print("💡 Install with: pip install pandas matplotlib")
+        print("💡 Install with: pip install matplotlib pyarrow")
     except Exception as e:
         print(f"❌ Error: {e}")
 
@@ -5,15 +5,128 @@ Provides multiple smoothing options to reduce noise and show clearer trends.
 """
 
 import argparse
-import gzip
-import pandas as pd
+from functools import lru_cache
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
 import re
-from scipy.signal import savgol_filter
+from numba import njit
+from k6_data import load_metric, percentile_from_sorted
 
-def plot_request_times_smooth(file_path, smoothing_method='rolling', window_size=50, resample_freq='1S'):
+# Windows longer than this are convolved via FFT overlap-add instead of directly
+OACONVOLVE_MIN_WINDOW = 64
+
+# Milliseconds per unit of a fixed-width resample frequency (e.g. '500ms', '1s',
+# '5min', '1h'), including the older pandas aliases L, S, T and H
+RESAMPLE_UNITS_MS = {
+    'ms': 1, 'L': 1,
+    's': 1000, 'S': 1000,
+    'min': 60 * 1000, 'T': 60 * 1000,
+    'h': 60 * 60 * 1000, 'H': 60 * 60 * 1000,
+}
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Default resolution of both the figure and the saved PNG (the figure uses the
+# same value so rasterized layers are rendered once at the output resolution)
+DEFAULT_DPI = 150
+
+def resample_width(freq):
+    """Bucket width in seconds of a fixed-width resample frequency such as '500ms', '1s', '5min' or '1h'.
+    
+    Buckets are aligned to multiples of the width since the epoch, so only
+    widths that divide a day evenly are accepted; those line up with pandas
+    resample's default origin (midnight of the first day).
+    """
+    match = re.fullmatch(r'(\d*)(ms|min|[sLSTHh])', freq.strip())
+    if not match:
+        raise ValueError(f"Unsupported resample frequency '{freq}': use a whole number of ms, s, min or h (e.g. 500ms, 1s, 5min, 1h)")
+    width_ms = int(match.group(1) or 1) * RESAMPLE_UNITS_MS[match.group(2)]
+    if width_ms == 0 or DAY_MS % width_ms:
+        raise ValueError(f"Resample frequency '{freq}' must be non-zero and divide a day evenly")
+    return width_ms / 1000
+
+def _resample_freq_arg(value):
+    """argparse type for --resample-freq: validate the frequency, keep the string."""
+    try:
+        resample_width(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+@njit('float64[::1](float64[::1], int64)', cache=True, fastmath=True)
+def rolling_mean(x, window):
+    """Centered rolling mean matching pandas' rolling(window, center=True).mean().
+    
+    Keeps a running sum (add the incoming value, subtract the outgoing one), so
+    the cost is O(N) regardless of window size. Positions without a full
+    window at the head and tail are NaN.
+    """
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 1 or window > n:
+        return out
+    
+    offset = window // 2
+    s = 0.0
+    for i in range(window):
+        s += x[i]
+    out[offset] = s / window
+    
+    for i in range(window, n):
+        s += x[i] - x[i - window]
+        out[i - window + 1 + offset] = s / window
+    return out
+
+@lru_cache(maxsize=None)
+def savgol_kernel(window_length, polyorder):
+    """Savitzky-Golay convolution coefficients, computed once per (window, order)."""
+    from scipy.signal import savgol_coeffs
+    return savgol_coeffs(window_length, polyorder)
+
+@njit('Tuple((float64[::1], float64[::1], int64[::1]))(int64[::1], float64[::1], int64)', cache=True)
+def bucket_stats(bucket_idx, values, n_buckets):
+    """Per-bucket mean, sample standard deviation and count in a single pass.
+    
+    Uses Welford's algorithm so each bucket only needs three accumulators.
+    """
+    count = np.zeros(n_buckets, np.int64)
+    mean = np.zeros(n_buckets)
+    m2 = np.zeros(n_buckets)
+    for i in range(len(values)):
+        b = bucket_idx[i]
+        count[b] += 1
+        delta = values[i] - mean[b]
+        mean[b] += delta / count[b]
+        m2[b] += delta * (values[i] - mean[b])
+    std = np.sqrt(m2 / np.maximum(count - 1, 1))
+    return mean, std, count
+
+def savgol_smooth(x, window_length, polyorder=3):
+    """Savitzky-Golay filter applied as a FIR convolution with cached coefficients.
+    
+    Produces the same result as savgol_filter(x, window_length, polyorder):
+    the interior is a single convolution (FFT overlap-add for long windows),
+    and only the two edge windows fall back to savgol_filter's polynomial fit.
+    """
+    # scipy is only imported when Savitzky-Golay smoothing is requested
+    from scipy.signal import oaconvolve, savgol_filter
+    
+    coeffs = savgol_kernel(window_length, polyorder)
+    if window_length > OACONVOLVE_MIN_WINDOW:
+        interior = oaconvolve(x, coeffs, mode='valid')
+    else:
+        interior = np.convolve(x, coeffs, mode='valid')
+    
+    half = window_length // 2
+    out = np.empty(len(x))
+    out[half:len(x) - half] = interior
+    out[:half] = savgol_filter(x[:window_length], window_length, polyorder)[:half]
+    out[len(x) - half:] = savgol_filter(x[-window_length:], window_length, polyorder)[window_length - half:]
+    return out
+
+def plot_request_times_smooth(file_path, smoothing_method='rolling', window_size=50, resample_freq='1s', interactive=False, dpi=DEFAULT_DPI):
     """Plot smoothed time series of HTTP request duration with percentile lines."""
     
     # Extract config name from filename
@@ -28,89 +141,93 @@ def plot_request_times_smooth(file_path, smoothing_method='rolling', window_size
     print(f"Loading {config} from {file_path}...")
     print(f"Using {smoothing_method} smoothing...")
     
-    # Load data
-    with gzip.open(file_path, 'rt') as f:
-        df = pd.read_csv(f)
-    
-    # Filter for HTTP request duration only
-    http_duration = df[df['metric_name'] == 'http_req_duration'].copy()
+    timestamps, values = load_metric(file_path, 'http_req_duration', ['timestamp', 'metric_value'])
     
-    if http_duration.empty:
+    if len(timestamps) == 0:
         print("No HTTP request duration data found!")
         return
     
-    # Convert timestamp to datetime
-    http_duration['timestamp'] = pd.to_datetime(http_duration['timestamp'], unit='s')
-    
-    # Sort by timestamp
-    http_duration = http_duration.sort_values('timestamp')
+    # Sort by timestamp (kept as float Unix seconds, no datetime conversion needed).
+    # K6 writes samples in roughly append order, so skip the sort when they
+    # are already ordered
+    if not np.all(timestamps[1:] >= timestamps[:-1]):
+        order = np.argsort(timestamps, kind='stable')
+        timestamps = timestamps[order]
+        values = values[order]
     
     # Calculate start time for relative timing
-    start_time = http_duration['timestamp'].min()
-    http_duration['relative_time'] = (http_duration['timestamp'] - start_time).dt.total_seconds()
+    start_time = timestamps[0]
+    relative_time = timestamps - start_time
     
-    # Calculate percentiles on raw data
-    p95 = http_duration['metric_value'].quantile(0.95)
-    p99 = http_duration['metric_value'].quantile(0.99)
-    avg = http_duration['metric_value'].mean()
-    max_val = http_duration['metric_value'].max()
+    # Calculate percentiles on raw data from a single sort of the durations
+    sorted_values = np.sort(values)
+    p95 = percentile_from_sorted(sorted_values, 0.95)
+    p99 = percentile_from_sorted(sorted_values, 0.99)
+    avg = values.mean()
+    max_val = sorted_values[-1]
     
     # Apply smoothing based on method
     if smoothing_method == 'rolling':
         # Rolling window average
-        http_duration['smoothed'] = http_duration['metric_value'].rolling(window=window_size, center=True).mean()
+        smoothed = rolling_mean(values, window_size)
         smooth_label = f'Rolling Average ({window_size} points)'
         
     elif smoothing_method == 'resample':
-        # Resample to time buckets (e.g., per-second averages)
-        http_duration.set_index('timestamp', inplace=True)
-        resampled = http_duration.resample(resample_freq)['metric_value'].agg(['mean', 'std', 'count']).reset_index()
-        resampled['relative_time'] = (resampled['timestamp'] - start_time).dt.total_seconds()
+        # Resample to time buckets (e.g., per-second averages), aligned to
+        # multiples of the bucket width like pandas resample
+        bucket_width = resample_width(resample_freq)
+        buckets = np.floor(timestamps / bucket_width).astype(np.int64)
+        first_bucket = buckets.min()
+        mean, std, count = bucket_stats(buckets - first_bucket, values, buckets.max() - first_bucket + 1)
+        bucket_time = (first_bucket + np.arange(len(count))) * bucket_width - start_time
         
         # Filter out buckets with too few samples
-        resampled = resampled[resampled['count'] >= 3]
+        keep = count >= 3
+        bucket_time, bucket_mean, bucket_std = bucket_time[keep], mean[keep], std[keep]
         smooth_label = f'Resampled ({resample_freq} buckets)'
         
     elif smoothing_method == 'savgol':
         # Savitzky-Golay filter for trend smoothing
-        if len(http_duration) > window_size:
-            http_duration['smoothed'] = savgol_filter(http_duration['metric_value'], 
-                                                    window_length=window_size if window_size % 2 == 1 else window_size + 1, 
-                                                    polyorder=3)
+        if len(values) > window_size:
+            window_length = window_size if window_size % 2 == 1 else window_size + 1
+            smoothed = savgol_smooth(values, window_length=window_length, polyorder=3)
         else:
             # Fall back to rolling average if not enough data
-            http_duration['smoothed'] = http_duration['metric_value'].rolling(window=min(10, len(http_duration)//2), center=True).mean()
+            smoothed = rolling_mean(values, min(10, len(values)//2))
         smooth_label = f'Savitzky-Golay Filter ({window_size} window)'
         
     elif smoothing_method == 'both':
         # Show both raw (faded) and smoothed data
-        http_duration['smoothed'] = http_duration['metric_value'].rolling(window=window_size, center=True).mean()
+        smoothed = rolling_mean(values, window_size)
         smooth_label = f'Rolling Average ({window_size} points)'
     
     # Create plot
-    plt.figure(figsize=(14, 8))
+    fig = plt.figure(figsize=(14, 8), dpi=dpi)
     
     if smoothing_method == 'both':
-        # Plot raw data as background (very faded)
-        plt.plot(http_duration['relative_time'], 
-                 http_duration['metric_value'], 
+        # Plot raw data as background (very faded); it has one vertex per
+        # sample, so rasterize it and keep only the smoothed line as a vector path
+        plt.plot(relative_time, 
+                 values, 
                  color='lightblue', 
                  alpha=0.3,
                  linewidth=0.5,
+                 rasterized=True,
+                 zorder=1,
                  label='Raw Data')
         
         # Plot smoothed data prominently
-        plt.plot(http_duration['relative_time'], 
-                 http_duration['smoothed'], 
+        plt.plot(relative_time, 
+                 smoothed, 
                  color='darkblue', 
                  linewidth=2,
                  label=smooth_label)
                  
     elif smoothing_method == 'resample':
         # Plot resampled data with error bars
-        plt.errorbar(resampled['relative_time'], 
-                    resampled['mean'],
-                    yerr=resampled['std'],
+        plt.errorbar(bucket_time, 
+                    bucket_mean,
+                    yerr=bucket_std,
                     color='darkblue', 
                     linewidth=2,
                     capsize=3,
@@ -118,15 +235,15 @@ def plot_request_times_smooth(file_path, smoothing_method='rolling', window_size
                     label=smooth_label)
                     
         # Also plot just the mean line for clarity
-        plt.plot(resampled['relative_time'], 
-                resampled['mean'], 
+        plt.plot(bucket_time, 
+                bucket_mean, 
                 color='navy', 
                 linewidth=1.5,
                 alpha=0.6)
     else:
         # Plot smoothed data only
-        plt.plot(http_duration['relative_time'], 
-                 http_duration['smoothed'], 
+        plt.plot(relative_time, 
+                 smoothed, 
                  color='darkblue', 
                  linewidth=2,
                  label=smooth_label)
@@ -161,8 +278,12 @@ def plot_request_times_smooth(file_path, smoothing_method='rolling', window_size
     
     # Save with smoothing method in filename
     output_file = f'request_times_{config}_smooth_{smoothing_method}.png'
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.show()
+    # tight_layout above already fits the content, so skip bbox_inches='tight'
+    # and its extra measuring render pass
+    plt.savefig(output_file, dpi=dpi)
+    if interactive:
+        plt.show()
+    plt.close(fig)
     
     print(f"📊 Statistics:")
     print(f"  P95: {p95:.1f}ms")
@@ -183,8 +304,16 @@ def main():
                        default=50,
                        help='Window size for rolling average or Savitzky-Golay filter (default: 50)')
     parser.add_argument('--resample-freq', '-r', 
-                       default='1S',
-                       help='Resampling frequency for resample method (default: 1S = 1 second buckets)')
+                       type=_resample_freq_arg,
+                       default='1s',
+                       help='Resampling frequency for resample method: a whole number of ms, s, min or h (or the pandas aliases L, S, T, H) that divides a day, e.g. 500ms, 5s, 1min, 1h (default: 1s = 1 second buckets)')
+    parser.add_argument('--dpi', 
+                       type=int, 
+                       default=DEFAULT_DPI,
+                       help=f'Resolution of the saved PNG (default: {DEFAULT_DPI})')
+    parser.add_argument('--interactive', '-i', 
+                       action='store_true',
+                       help='Show the plot in an interactive window after saving it')
     
     args = parser.parse_args()
     
@@ -192,11 +321,14 @@ def main():
         print(f"❌ File not found: {args.file}")
         return
     
+    if args.interactive:
+        plt.switch_backend(matplotlib.rcParamsOrig['backend'])
+    
     try:
-        plot_request_times_smooth(args.file, args.method, args.window, args.resample_freq)
+        plot_request_times_smooth(args.file, args.method, args.window, args.resample_freq, args.interactive, args.dpi)
     except ImportError as e:
         print(f"❌ Missing libraries: {e}")
-        print("💡 Install with: pip install pandas matplotlib scipy")
+        print("💡 Install with: pip install matplotlib pyarrow numba scipy")
     except Exception as e:
         print(f"❌ Error: {e}")
 
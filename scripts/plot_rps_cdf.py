@@ -1,52 +1,67 @@
 #!/usr/bin/env python3
-import pandas as pd
+import argparse
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-import sys
-import gzip
+from k6_data import load_metric, requests_per_second
+from figures import prepare_axes, render_files
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python plot_rps_cdf.py <filename>")
-        sys.exit(1)
-    
-    filename = sys.argv[1]
-    
-    # Read the file (handle both .gz and regular files)
-    if filename.endswith('.gz'):
-        with gzip.open(filename, 'rt') as f:
-            df = pd.read_csv(f)
-    else:
-        df = pd.read_csv(filename)
+# Figure size shared by every file plotted in one run
+FIGSIZE = (10, 6)
+
+def plot_rps_cdf(filename, interactive=False, ax=None):
+    """Plot the CDF of requests per second for a single file."""
     
-    # Filter for http_reqs metric only
-    http_reqs = df[df['metric_name'] == 'http_reqs'].copy()
+    (timestamps,) = load_metric(filename, 'http_reqs', ['timestamp'])
     
-    # Convert timestamp to datetime
-    http_reqs['datetime'] = pd.to_datetime(http_reqs['timestamp'], unit='s')
+    if len(timestamps) == 0:
+        print("No HTTP requests data found!")
+        return
     
-    # Round to seconds and count requests per second
-    http_reqs['second'] = http_reqs['datetime'].dt.floor('S')
-    rps = http_reqs.groupby('second').size()
+    rps = requests_per_second(timestamps)
     
     # Create CDF
-    sorted_rps = np.sort(rps.values)
+    sorted_rps = np.sort(rps)
     cumulative = np.arange(1, len(sorted_rps) + 1) / len(sorted_rps)
     
-    # Plot
-    plt.figure(figsize=(10, 6))
-    plt.plot(sorted_rps, cumulative, linewidth=2)
-    plt.xlabel('Requests per Second')
-    plt.ylabel('Cumulative Probability')
-    plt.title(f'CDF of Requests per Second - {filename}')
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
+    owns_figure = ax is None
+    fig, ax = prepare_axes(ax, FIGSIZE)
+    
+    _render(ax, sorted_rps, cumulative, filename)
+    fig.tight_layout()
     
     # Save and show
     output_name = filename.replace('.gz', '').replace('.csv', '') + '_rps_cdf.png'
-    plt.savefig(output_name, dpi=150, bbox_inches='tight')
+    fig.savefig(output_name, dpi=150, bbox_inches='tight')
     print(f"Plot saved as: {output_name}")
-    plt.show()
+    if interactive:
+        plt.show()
+    if owns_figure:
+        plt.close(fig)
+
+def _render(ax, sorted_rps, cumulative, filename):
+    """Draw the RPS CDF onto ax."""
+    ax.plot(sorted_rps, cumulative, linewidth=2)
+    ax.set_xlabel('Requests per Second')
+    ax.set_ylabel('Cumulative Probability')
+    ax.set_title(f'CDF of Requests per Second - {filename}')
+    ax.grid(True, alpha=0.3)
+
+def main():
+    parser = argparse.ArgumentParser(description='Plot CDF of requests per second from K6 benchmark data')
+    parser.add_argument('filenames', nargs='+', help='Path(s) to CSV files, optionally gzipped')
+    parser.add_argument('--interactive', '-i', 
+                       action='store_true',
+                       help='Show the plot in an interactive window after saving it')
+    
+    args = parser.parse_args()
+    
+    if args.interactive:
+        plt.switch_backend(matplotlib.rcParamsOrig['backend'])
+    
+    render_files(args.filenames, lambda path, ax: plot_rps_cdf(path, args.interactive, ax=ax),
+                 FIGSIZE, args.interactive)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,74 +3,119 @@
 Smoothed CDF plot of requests per second with multiple smoothing options.
 """
 
-import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-import sys
-import gzip
 import argparse
 from pathlib import Path
-from scipy.interpolate import interp1d
-from scipy.ndimage import gaussian_filter1d
+from numba import njit
+from k6_data import load_metric, percentile_from_sorted, requests_per_second
+from figures import prepare_axes, render_files
 
-def plot_rps_cdf_smooth(filename, smoothing_method='interpolate', smoothing_factor=0.5, num_points=500):
+# Default resolution of the saved PNG
+DEFAULT_DPI = 150
+
+# Figure size shared by every file plotted in one run
+FIGSIZE = (12, 8)
+
+@njit('float64[::1](float64[::1], float64[::1], float64[::1])', cache=True)
+def pchip_eval(xs, ys, xq):
+    """Monotone cubic (PCHIP) interpolation of knots (xs, ys) at points xq.
+    
+    xs must be strictly increasing and xq sorted, so a single forward pass
+    finds each query's interval. Slopes follow Fritsch-Carlson (as in
+    scipy's PchipInterpolator), so the curve never overshoots between knots
+    and an interpolated CDF stays monotone.
+    """
+    n = len(xs)
+    h = np.diff(xs)
+    delta = np.diff(ys) / h
+    
+    # Interior slopes: weighted harmonic mean, zero at local extrema
+    d = np.zeros(n)
+    for k in range(1, n - 1):
+        if delta[k - 1] * delta[k] > 0:
+            w1 = 2 * h[k] + h[k - 1]
+            w2 = h[k] + 2 * h[k - 1]
+            d[k] = (w1 + w2) / (w1 / delta[k - 1] + w2 / delta[k])
+    
+    # End slopes: one-sided three-point estimate, limited to preserve shape
+    for k, h0, h1, m0, m1 in ((0, h[0], h[1], delta[0], delta[1]),
+                              (n - 1, h[n - 2], h[n - 3], delta[n - 2], delta[n - 3])):
+        s = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+        if np.sign(s) != np.sign(m0):
+            s = 0.0
+        elif np.sign(m0) != np.sign(m1) and abs(s) > abs(3 * m0):
+            s = 3 * m0
+        d[k] = s
+    
+    out = np.empty(len(xq))
+    j = 0
+    for i in range(len(xq)):
+        while j < n - 2 and xs[j + 1] < xq[i]:
+            j += 1
+        t = (xq[i] - xs[j]) / h[j]
+        out[i] = ((1 + 2 * t) * (1 - t) ** 2 * ys[j]
+                  + t * (1 - t) ** 2 * h[j] * d[j]
+                  + t ** 2 * (3 - 2 * t) * ys[j + 1]
+                  + t ** 2 * (t - 1) * h[j] * d[j + 1])
+    return out
+
+def interpolate_cdf(xs, ys, num_points):
+    """Evaluate a monotone PCHIP curve through the CDF knots at num_points evenly spaced x values.
+    
+    xs must be strictly increasing; the distinct RPS values from the histogram
+    always are.
+    """
+    smooth_x = np.linspace(xs.min(), xs.max(), num_points)
+    return smooth_x, pchip_eval(xs.astype(np.float64), ys.astype(np.float64), smooth_x)
+
+def plot_rps_cdf_smooth(filename, smoothing_method='interpolate', smoothing_factor=0.5, num_points=500, interactive=False, dpi=DEFAULT_DPI, ax=None):
     """Plot smoothed CDF of requests per second."""
     
     print(f"Loading RPS data from {filename}...")
     print(f"Using {smoothing_method} smoothing...")
     
-    # Read the file (handle both .gz and regular files)
-    if filename.endswith('.gz'):
-        with gzip.open(filename, 'rt') as f:
-            df = pd.read_csv(f)
-    else:
-        df = pd.read_csv(filename)
-    
-    # Filter for http_reqs metric only
-    http_reqs = df[df['metric_name'] == 'http_reqs'].copy()
+    (timestamps,) = load_metric(filename, 'http_reqs', ['timestamp'])
     
-    if http_reqs.empty:
+    if len(timestamps) == 0:
         print("No HTTP requests data found!")
         return
     
-    # Convert timestamp to datetime
-    http_reqs['datetime'] = pd.to_datetime(http_reqs['timestamp'], unit='s')
+    rps = requests_per_second(timestamps)
     
-    # Round to seconds and count requests per second
-    http_reqs['second'] = http_reqs['datetime'].dt.floor('s')
-    rps = http_reqs.groupby('second').size()
+    # Histogram the RPS values; they are small non-negative integers, so this
+    # doubles as a counting sort and replaces np.sort + np.unique
+    rps_hist = np.bincount(rps)
+    unique_rps = np.nonzero(rps_hist)[0]
     
     # Create raw CDF data
-    sorted_rps = np.sort(rps.values)
+    sorted_rps = np.repeat(unique_rps, rps_hist[unique_rps])
     cumulative = np.arange(1, len(sorted_rps) + 1) / len(sorted_rps)
     
-    # Remove duplicates for interpolation (keep unique x values with corresponding y values)
-    unique_rps, unique_indices = np.unique(sorted_rps, return_index=True)
-    unique_cumulative = cumulative[unique_indices]
+    # CDF value at each distinct RPS (unique x values for interpolation)
+    unique_cumulative = np.cumsum(rps_hist)[unique_rps] / len(sorted_rps)
     
-    # Calculate statistics
-    p50 = np.percentile(sorted_rps, 50)
-    p95 = np.percentile(sorted_rps, 95)
-    p99 = np.percentile(sorted_rps, 99)
-    mean_rps = np.mean(sorted_rps)
-    max_rps = np.max(sorted_rps)
+    # Calculate statistics by indexing into the already-sorted samples
+    p50 = percentile_from_sorted(sorted_rps, 0.50)
+    p95 = percentile_from_sorted(sorted_rps, 0.95)
+    p99 = percentile_from_sorted(sorted_rps, 0.99)
+    mean_rps = sorted_rps.mean()
+    max_rps = sorted_rps[-1]
     
     # Apply smoothing based on method
     if smoothing_method == 'interpolate':
-        # Cubic spline interpolation for smooth curve
+        # Monotone cubic interpolation for smooth curve
         if len(unique_rps) > 4:  # Need at least 4 points for cubic
-            f = interp1d(unique_rps, unique_cumulative, kind='cubic', bounds_error=False, fill_value=(0, 1))
-            smooth_x = np.linspace(unique_rps.min(), unique_rps.max(), num_points)
-            smooth_y = f(smooth_x)
-            # Remove any NaN values
-            mask = ~np.isnan(smooth_y)
-            smooth_x, smooth_y = smooth_x[mask], smooth_y[mask]
+            smooth_x, smooth_y = interpolate_cdf(unique_rps, unique_cumulative, num_points)
         else:
             smooth_x, smooth_y = unique_rps, unique_cumulative
         smooth_label = f'Interpolated CDF ({num_points} points)'
         
     elif smoothing_method == 'gaussian':
         # Gaussian filter smoothing
+        from scipy.ndimage import gaussian_filter1d
         sigma = smoothing_factor * len(sorted_rps) / 100  # Convert factor to sigma
         smooth_y = gaussian_filter1d(cumulative, sigma=sigma)
         smooth_x = sorted_rps
@@ -82,65 +127,38 @@ def plot_rps_cdf_smooth(filename, smoothing_method='interpolate', smoothing_fact
         bin_edges = np.linspace(sorted_rps.min(), sorted_rps.max(), num_bins + 1)
         bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
         
-        # Calculate CDF for each bin
-        smooth_y = []
-        for edge in bin_centers:
-            smooth_y.append(np.mean(sorted_rps <= edge))
-        
+        # Calculate CDF for each bin (sorted_rps is sorted, so this is a binary search)
+        smooth_y = np.searchsorted(sorted_rps, bin_centers, side='right') / len(sorted_rps)
         smooth_x = bin_centers
-        smooth_y = np.array(smooth_y)
         smooth_label = f'Binned CDF ({num_bins} bins)'
         
     elif smoothing_method == 'both':
         # Show both raw and smoothed
         if len(unique_rps) > 4:
-            f = interp1d(unique_rps, unique_cumulative, kind='cubic', bounds_error=False, fill_value=(0, 1))
-            smooth_x = np.linspace(unique_rps.min(), unique_rps.max(), num_points)
-            smooth_y = f(smooth_x)
-            mask = ~np.isnan(smooth_y)
-            smooth_x, smooth_y = smooth_x[mask], smooth_y[mask]
+            smooth_x, smooth_y = interpolate_cdf(unique_rps, unique_cumulative, num_points)
         else:
             smooth_x, smooth_y = unique_rps, unique_cumulative
         smooth_label = f'Interpolated CDF'
     
-    # Create plot
-    plt.figure(figsize=(12, 8))
-    
-    if smoothing_method == 'both':
-        # Plot raw data as steps (faded)
-        plt.step(sorted_rps, cumulative, where='post', 
-                color='lightblue', alpha=0.6, linewidth=1, label='Raw CDF (steps)')
-        
-        # Plot smoothed curve
-        plt.plot(smooth_x, smooth_y, color='darkblue', linewidth=2.5, label=smooth_label)
-    else:
-        # Plot smoothed data only
-        if smoothing_method == 'binned':
-            plt.step(smooth_x, smooth_y, where='mid', 
-                    color='darkblue', linewidth=2, label=smooth_label)
-        else:
-            plt.plot(smooth_x, smooth_y, color='darkblue', linewidth=2.5, label=smooth_label)
-    
-    # Add percentile lines
-    plt.axvline(x=p50, color='green', linestyle='-', alpha=0.7, linewidth=1.5, label=f'P50: {p50:.1f} RPS')
-    plt.axvline(x=p95, color='orange', linestyle='--', linewidth=2, label=f'P95: {p95:.1f} RPS')
-    plt.axvline(x=p99, color='red', linestyle=':', linewidth=2, label=f'P99: {p99:.1f} RPS')
-    
-    plt.xlabel('Requests per Second')
-    plt.ylabel('Cumulative Probability')
+    owns_figure = ax is None
+    fig, ax = prepare_axes(ax, FIGSIZE)
     
     # Extract config name from filename for title
     config_name = Path(filename).stem.replace('-20vus-60s-t3.medium', '')
-    plt.title(f'Smoothed CDF of Requests per Second - {config_name}')
-    plt.grid(True, alpha=0.3)
-    plt.legend()
-    plt.tight_layout()
+    _render(ax, smoothing_method, sorted_rps, cumulative, smooth_x, smooth_y, smooth_label,
+            p50, p95, p99, config_name)
+    fig.tight_layout()
     
     # Save with smoothing method in filename
     base_name = Path(filename).stem.replace('.gz', '')
     output_name = f'{base_name}_rps_cdf_smooth_{smoothing_method}.png'
-    plt.savefig(output_name, dpi=300, bbox_inches='tight')
-    plt.show()
+    # tight_layout above already fits the content, so skip bbox_inches='tight'
+    # and its extra measuring render pass
+    fig.savefig(output_name, dpi=dpi)
+    if interactive:
+        plt.show()
+    if owns_figure:
+        plt.close(fig)
     
     print(f"📊 RPS Statistics:")
     print(f"  P50: {p50:.1f} RPS")
@@ -150,13 +168,43 @@ def plot_rps_cdf_smooth(filename, smoothing_method='interpolate', smoothing_fact
     print(f"  Max: {max_rps:.1f} RPS")
     print(f"📈 Smoothed CDF plot saved as: {output_name}")
 
+def _render(ax, smoothing_method, sorted_rps, cumulative, smooth_x, smooth_y, smooth_label,
+            p50, p95, p99, config_name):
+    """Draw the (smoothed) RPS CDF and percentile lines onto ax."""
+    
+    if smoothing_method == 'both':
+        # Plot raw data as steps (faded)
+        ax.step(sorted_rps, cumulative, where='post', 
+                color='lightblue', alpha=0.6, linewidth=1, label='Raw CDF (steps)')
+        
+        # Plot smoothed curve
+        ax.plot(smooth_x, smooth_y, color='darkblue', linewidth=2.5, label=smooth_label)
+    else:
+        # Plot smoothed data only
+        if smoothing_method == 'binned':
+            ax.step(smooth_x, smooth_y, where='mid', 
+                    color='darkblue', linewidth=2, label=smooth_label)
+        else:
+            ax.plot(smooth_x, smooth_y, color='darkblue', linewidth=2.5, label=smooth_label)
+    
+    # Add percentile lines
+    ax.axvline(x=p50, color='green', linestyle='-', alpha=0.7, linewidth=1.5, label=f'P50: {p50:.1f} RPS')
+    ax.axvline(x=p95, color='orange', linestyle='--', linewidth=2, label=f'P95: {p95:.1f} RPS')
+    ax.axvline(x=p99, color='red', linestyle=':', linewidth=2, label=f'P99: {p99:.1f} RPS')
+    
+    ax.set_xlabel('Requests per Second')
+    ax.set_ylabel('Cumulative Probability')
+    ax.set_title(f'Smoothed CDF of Requests per Second - {config_name}')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+
 def main():
     parser = argparse.ArgumentParser(description='Plot smoothed CDF of requests per second from K6 benchmark data')
-    parser.add_argument('file', help='Path to gzipped CSV file')
+    parser.add_argument('files', nargs='+', help='Path(s) to gzipped CSV files')
     parser.add_argument('--method', '-m', 
                        choices=['interpolate', 'gaussian', 'binned', 'both'], 
                        default='interpolate',
-                       help='Smoothing method: interpolate (cubic spline), gaussian (filter), binned (histogram), both (raw + smooth)')
+                       help='Smoothing method: interpolate (monotone PCHIP), gaussian (filter), binned (histogram), both (raw + smooth)')
     parser.add_argument('--factor', '-f', 
                        type=float, 
                        default=0.5,
@@ -165,18 +213,32 @@ def main():
                        type=int, 
                        default=500,
                        help='Number of interpolation points (default: 500)')
+    parser.add_argument('--dpi', 
+                       type=int, 
+                       default=DEFAULT_DPI,
+                       help=f'Resolution of the saved PNG (default: {DEFAULT_DPI})')
+    parser.add_argument('--interactive', '-i', 
+                       action='store_true',
+                       help='Show the plot in an interactive window after saving it')
     
     args = parser.parse_args()
     
-    if not Path(args.file).exists():
-        print(f"❌ File not found: {args.file}")
-        return
+    for file in args.files:
+        if not Path(file).exists():
+            print(f"❌ File not found: {file}")
+            return
+    
+    if args.interactive:
+        plt.switch_backend(matplotlib.rcParamsOrig['backend'])
     
     try:
-        plot_rps_cdf_smooth(args.file, args.method, args.factor, args.points)
+        render_files(args.files,
+                     lambda path, ax: plot_rps_cdf_smooth(path, args.method, args.factor, args.points,
+                                                          args.interactive, args.dpi, ax=ax),
+                     FIGSIZE, args.interactive)
     except ImportError as e:
         print(f"❌ Missing libraries: {e}")
-        print("💡 Install with: pip install pandas matplotlib scipy")
+        print("💡 Install with: pip install matplotlib pyarrow numba scipy")
     except Exception as e:
         print(f"❌ Error: {e}")
 
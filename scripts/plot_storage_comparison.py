@@ -4,105 +4,128 @@ Storage cost comparison bar chart for OTEL collector configurations.
 """
 
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgba_array
+from matplotlib.patches import Patch
 import numpy as np
 import argparse
 from pathlib import Path
 
-def parse_size_to_mb(size_str):
-    """Convert size string (e.g., '120.1 MiB', '7.0 MiB') to MB float."""
-    if 'MiB' in size_str:
-        return float(size_str.replace(' MiB', ''))
-    elif 'GiB' in size_str:
-        return float(size_str.replace(' GiB', '')) * 1024
-    elif 'KiB' in size_str:
-        return float(size_str.replace(' KiB', '')) / 1024
-    else:
-        # Assume MB if no unit
-        return float(size_str)
+# Binary size units relative to MiB; values without a unit are taken as MiB
+SIZE_UNITS_MB = {'MiB': 1.0, 'GiB': 1024.0, 'KiB': 1.0 / 1024.0}
 
-def clean_config_name(config_name):
-    """Clean up configuration names for better display."""
-    # Remove common prefixes and suffixes
-    name = config_name.replace('quickpizza-', '').replace('-bucket', '')
-    
-    # Map to cleaner names
-    name_mapping = {
-        'http-json': 'Custom HTTP-JSON',
-        'default-collector': 'Default Collector',
-        'custom-http-json-gzip': 'Custom HTTP-JSON+gzip',
-        'custom-grcp-gzip': 'Custom gRPC+gzip',  # Note: typo in original data
-        'custom-grpc': 'Custom gRPC'
-    }
-    
-    return name_mapping.get(name, name.title())
+# Display names for configurations (after removing the 'quickpizza-' prefix
+# and '-bucket' suffix); anything not listed is title-cased
+NAME_MAPPING = {
+    'http-json': 'Custom HTTP-JSON',
+    'default-collector': 'Default Collector',
+    'custom-http-json-gzip': 'Custom HTTP-JSON+gzip',
+    'custom-grcp-gzip': 'Custom gRPC+gzip',  # Note: typo in original data
+    'custom-grpc': 'Custom gRPC'
+}
 
-def plot_storage_comparison(csv_file, show_savings=True, show_cost_estimate=False, cost_per_gb_month=0.023):
+# Legend handles for the size and object count charts
+SIZE_LEGEND = [
+    Patch(facecolor='#e74c3c', label='Baseline (Default)'),
+    Patch(facecolor='#f39c12', label='Moderate Savings'),
+    Patch(facecolor='#2ecc71', label='Good Savings (>50%)'),
+    Patch(facecolor='#27ae60', label='Massive Savings (>90%)')
+]
+
+OBJECT_LEGEND = [
+    Patch(facecolor='#e74c3c', label='Baseline (Default)'),
+    Patch(facecolor='#3498db', label='More Objects'),
+    Patch(facecolor='#9b59b6', label='Fewer Objects')
+]
+
+def plot_storage_comparison(csv_file, show_savings=True, show_cost_estimate=False, cost_per_gb_month=0.023, show=False):
     """Create side-by-side storage comparison bar chart."""
     
     print(f"Loading storage data from {csv_file}...")
     
     # Read the CSV data
-    df = pd.read_csv(csv_file)
+    df = pd.read_csv(csv_file,
+                     usecols=['configuration', 'total size', 'total objects'],
+                     dtype={'configuration': 'string', 'total size': 'string', 'total objects': 'int64'})
     
-    # Parse sizes to MB
-    df['size_mb'] = df['total size'].apply(parse_size_to_mb)
+    # Parse sizes to MB (e.g., '120.1 MiB', '7.0 MiB')
+    parts = df['total size'].str.extract(r'^\s*([0-9]*\.?[0-9]+)\s*([KMG]iB)?\s*$')
+    malformed = parts[0].isna()
+    if malformed.any():
+        raise ValueError(f"Unrecognized size value(s): {', '.join(df.loc[malformed, 'total size'].astype(str))}")
+    df['size_mb'] = parts[0].astype('float64') * parts[1].fillna('MiB').map(SIZE_UNITS_MB).to_numpy()
     
     # Clean configuration names
-    df['clean_config'] = df['configuration'].apply(clean_config_name)
+    base_names = df['configuration'].str.removeprefix('quickpizza-').str.removesuffix('-bucket')
+    df['clean_config'] = base_names.map(NAME_MAPPING).fillna(base_names.str.title())
     
     # Calculate savings percentages relative to default
-    default_size = df[df['clean_config'] == 'Default Collector']['size_mb'].iloc[0]
-    default_objects = df[df['clean_config'] == 'Default Collector']['total objects'].iloc[0]
-    df['savings_percent'] = ((default_size - df['size_mb']) / default_size) * 100
-    df['object_change_percent'] = ((df['total objects'] - default_objects) / default_objects) * 100
+    size_values = df['size_mb'].to_numpy()
+    object_values = df['total objects'].to_numpy()
+    is_baseline = df['clean_config'].to_numpy() == 'Default Collector'
+    if not is_baseline.any():
+        raise ValueError("No 'Default Collector' configuration found to use as the baseline")
+    baseline_idx = is_baseline.argmax()
+    default_size = size_values[baseline_idx]
+    default_objects = object_values[baseline_idx]
+    df['savings_percent'] = ((default_size - size_values) / default_size) * 100
+    df['object_change_percent'] = ((object_values - default_objects) / default_objects) * 100
     
     # Sort by size for better visualization
     df = df.sort_values('size_mb', ascending=False)
     
+    # Pull the sorted columns out once; everything below works on these arrays
+    names = df['clean_config'].to_numpy()
+    sizes = df['size_mb'].to_numpy()
+    objs = df['total objects'].to_numpy()
+    sp = df['savings_percent'].to_numpy()
+    op = df['object_change_percent'].to_numpy()
+    
     # Create the plot with two subplots side by side
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
     
     # Color scheme: red for default, green gradient for savings
-    size_colors = []
-    object_colors = []
-    for idx, row in df.iterrows():
-        if 'Default' in row['clean_config']:
-            size_colors.append('#e74c3c')  # Red for baseline
-            object_colors.append('#e74c3c')  # Red for baseline
-        elif row['savings_percent'] > 90:
-            size_colors.append('#27ae60')  # Dark green for massive savings
-        elif row['savings_percent'] > 50:
-            size_colors.append('#2ecc71')  # Green for good savings
-        elif row['savings_percent'] > 0:
-            size_colors.append('#f39c12')  # Orange for moderate savings
-        else:
-            size_colors.append('#e67e22')  # Dark orange for worse than default
-            
-        # Object count colors (different logic - more objects could be good or bad)
-        if 'Default' not in row['clean_config']:
-            if row['object_change_percent'] > 0:
-                object_colors.append('#3498db')  # Blue for more objects
-            elif row['object_change_percent'] < 0:
-                object_colors.append('#9b59b6')  # Purple for fewer objects
-            else:
-                object_colors.append('#95a5a6')  # Gray for same
+    is_default = df['clean_config'].str.contains('Default').to_numpy(dtype=bool)
+    size_colors = np.select(
+        [is_default, sp > 90, sp > 50, sp > 0],
+        ['#e74c3c',  # Red for baseline
+         '#27ae60',  # Dark green for massive savings
+         '#2ecc71',  # Green for good savings
+         '#f39c12'],  # Orange for moderate savings
+        default='#e67e22')  # Dark orange for worse than default
+    
+    # Object count colors (different logic - more objects could be good or bad)
+    object_colors = np.select(
+        [is_default, op > 0, op < 0],
+        ['#e74c3c',  # Red for baseline
+         '#3498db',  # Blue for more objects
+         '#9b59b6'],  # Purple for fewer objects
+        default='#95a5a6')  # Gray for same
+    
+    # Parse the hex colors once instead of per bar inside matplotlib
+    size_rgba = to_rgba_array(size_colors)
+    object_rgba = to_rgba_array(object_colors)
     
     # === LEFT PLOT: Storage Size ===
-    bars1 = ax1.bar(df['clean_config'], df['size_mb'], color=size_colors, alpha=0.8, edgecolor='black', linewidth=1)
+    bars1 = ax1.bar(names, sizes, color=size_rgba, alpha=0.8, edgecolor='black', linewidth=1)
+    
+    # Both charts share the same categories, so the bar centers are computed once
+    x_centers = np.array([bar.get_x() + bar.get_width()/2. for bar in bars1])
+    max_size = sizes.max()
+    max_obj = objs.max()
     
     # Add value labels on bars
-    for bar, size, savings in zip(bars1, df['size_mb'], df['savings_percent']):
-        height = bar.get_height()
-        
+    for x, size, savings in zip(x_centers, sizes, sp):
         # Size label
-        ax1.text(bar.get_x() + bar.get_width()/2., height + max(df['size_mb']) * 0.02,
+        ax1.text(x, size + max_size * 0.02,
                 f'{size:.1f} MiB',
                 ha='center', va='bottom', fontweight='bold', fontsize=10)
         
         # Savings percentage (if showing savings and not default)
         if show_savings and savings > 0:
-            ax1.text(bar.get_x() + bar.get_width()/2., height/2,
+            ax1.text(x, size/2,
                     f'-{savings:.0f}%',
                     ha='center', va='center', fontweight='bold', 
                     fontsize=11, color='white')
@@ -114,21 +137,19 @@ def plot_storage_comparison(csv_file, show_savings=True, show_cost_estimate=Fals
     ax1.tick_params(axis='x', rotation=45)
     
     # === RIGHT PLOT: Object Count ===
-    bars2 = ax2.bar(df['clean_config'], df['total objects'], color=object_colors, alpha=0.8, edgecolor='black', linewidth=1)
+    ax2.bar(names, objs, color=object_rgba, alpha=0.8, edgecolor='black', linewidth=1)
     
     # Add value labels on bars
-    for bar, objects, change in zip(bars2, df['total objects'], df['object_change_percent']):
-        height = bar.get_height()
-        
+    for x, objects, change in zip(x_centers, objs, op):
         # Object count label
-        ax2.text(bar.get_x() + bar.get_width()/2., height + max(df['total objects']) * 0.02,
+        ax2.text(x, objects + max_obj * 0.02,
                 f'{int(objects)}',
                 ha='center', va='bottom', fontweight='bold', fontsize=10)
         
         # Change percentage (if showing savings and not default)
         if show_savings and change != 0:
             change_str = f'+{change:.0f}%' if change > 0 else f'{change:.0f}%'
-            ax2.text(bar.get_x() + bar.get_width()/2., height/2,
+            ax2.text(x, objects/2,
                     change_str,
                     ha='center', va='center', fontweight='bold', 
                     fontsize=11, color='white')
@@ -141,51 +162,41 @@ def plot_storage_comparison(csv_file, show_savings=True, show_cost_estimate=Fals
     
     # Add cost estimate if requested
     if show_cost_estimate:
-        monthly_costs = (df['size_mb'] / 1024) * cost_per_gb_month  # Convert MB to GB and multiply by cost
+        monthly_costs = (sizes / 1024) * cost_per_gb_month  # Convert MB to GB and multiply by cost
         
         # Add cost annotations to size chart
-        for i, (bar, cost) in enumerate(zip(bars1, monthly_costs)):
-            ax1.text(bar.get_x() + bar.get_width()/2., bar.get_height() + max(df['size_mb']) * 0.05,
+        for x, size, cost in zip(x_centers, sizes, monthly_costs):
+            ax1.text(x, size + max_size * 0.05,
                     f'${cost:.3f}/mo',
                     ha='center', va='bottom', fontsize=9, style='italic', color='gray')
     
     # Add legends
-    size_legend_elements = [
-        plt.Rectangle((0,0),1,1, facecolor='#e74c3c', label='Baseline (Default)'),
-        plt.Rectangle((0,0),1,1, facecolor='#f39c12', label='Moderate Savings'),
-        plt.Rectangle((0,0),1,1, facecolor='#2ecc71', label='Good Savings (>50%)'),
-        plt.Rectangle((0,0),1,1, facecolor='#27ae60', label='Massive Savings (>90%)')
-    ]
-    ax1.legend(handles=size_legend_elements, loc='upper right', fontsize=9)
-    
-    object_legend_elements = [
-        plt.Rectangle((0,0),1,1, facecolor='#e74c3c', label='Baseline (Default)'),
-        plt.Rectangle((0,0),1,1, facecolor='#3498db', label='More Objects'),
-        plt.Rectangle((0,0),1,1, facecolor='#9b59b6', label='Fewer Objects')
-    ]
-    ax2.legend(handles=object_legend_elements, loc='upper right', fontsize=9)
-    
-    plt.tight_layout()
+    ax1.legend(handles=SIZE_LEGEND, loc='upper right', fontsize=9)
+    ax2.legend(handles=OBJECT_LEGEND, loc='upper right', fontsize=9)
+    
+    fig.tight_layout()
     
     # Save the plot
     output_file = 'storage_comparison_bar_chart.png'
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.show()
+    fig.savefig(output_file, dpi=300, bbox_inches='tight')
+    if show:
+        plt.show()
+    plt.close(fig)
     
     # Print summary statistics
     print(f"\n📊 Storage Comparison Summary:")
     print(f"{'Configuration':<25} {'Size (MiB)':<12} {'Size Change':<12} {'Objects':<8} {'Obj Change':<10}")
     print("-" * 75)
     
-    for _, row in df.iterrows():
-        size_change_str = f"{row['savings_percent']:+.0f}%" if row['savings_percent'] != 0 else "baseline"
-        obj_change_str = f"{row['object_change_percent']:+.0f}%" if row['object_change_percent'] != 0 else "baseline"
-        print(f"{row['clean_config']:<25} {row['size_mb']:<12.1f} {size_change_str:<12} {row['total objects']:<8} {obj_change_str:<10}")
+    for config, size, savings, objects, change in zip(names, sizes, sp, objs, op):
+        size_change_str = f"{savings:+.0f}%" if savings != 0 else "baseline"
+        obj_change_str = f"{change:+.0f}%" if change != 0 else "baseline"
+        print(f"{config:<25} {size:<12.1f} {size_change_str:<12} {objects:<8} {obj_change_str:<10}")
     
     print(f"\n📈 Chart saved as: {output_file}")
-    print(f"💾 Best storage efficiency: {df.loc[df['size_mb'].idxmin(), 'clean_config']} ({df['size_mb'].min():.1f} MiB)")
-    print(f"📦 Object count range: {df['total objects'].min()}-{df['total objects'].max()} objects")
-    print(f"💰 Potential savings: Up to {df['savings_percent'].max():.0f}% reduction in storage costs")
+    print(f"💾 Best storage efficiency: {names[sizes.argmin()]} ({sizes.min():.1f} MiB)")
+    print(f"📦 Object count range: {objs.min()}-{max_obj} objects")
+    print(f"💰 Potential savings: Up to {sp.max():.0f}% reduction in storage costs")
 
 def main():
     parser = argparse.ArgumentParser(description='Create storage comparison bar chart for OTEL collector configurations')
@@ -193,6 +204,8 @@ def main():
     parser.add_argument('--no-savings', action='store_true', help='Hide savings percentages on bars')
     parser.add_argument('--cost-estimate', action='store_true', help='Show estimated monthly costs')
     parser.add_argument('--cost-per-gb', type=float, default=0.023, help='Cost per GB per month (default: $0.023 for AWS S3)')
+    parser.add_argument('--show', '--interactive', '-i', dest='show', action='store_true',
+                       help='Show the chart in an interactive window after saving it')
     
     args = parser.parse_args()
     
@@ -200,11 +213,15 @@ def main():
         print(f"❌ File not found: {args.file}")
         return
     
+    if args.show:
+        plt.switch_backend(matplotlib.rcParamsOrig['backend'])
+    
     try:
         plot_storage_comparison(args.file, 
                               show_savings=not args.no_savings,
                               show_cost_estimate=args.cost_estimate,
-                              cost_per_gb_month=args.cost_per_gb)
+                              cost_per_gb_month=args.cost_per_gb,
+                              show=args.show)
     except Exception as e:
         print(f"❌ Error: {e}")
 